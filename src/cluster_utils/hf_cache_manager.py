@@ -41,9 +41,22 @@ Usage:
     #   oellm schedule-eval --models /path/to/my-model ...
 """
 
+import ctypes
+import errno
 import getpass
+import hashlib
 import os
+import platform
+import shutil
+import sqlite3
+import stat
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -60,6 +73,478 @@ def _detect_cluster_summary() -> str:
         return "local machine"
 
 
+# Marks "not looked up yet" where None is a meaningful value
+_SENTINEL = object()
+
+# huggingface_hub is heavy – imported on first use, then kept here
+_hf_hub = None
+
+
+def _get_hf_hub():
+    """Return the ``huggingface_hub`` module, importing it once."""
+    global _hf_hub
+    if _hf_hub is None:
+        import huggingface_hub
+        _hf_hub = huggingface_hub
+    return _hf_hub
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Filesystem helpers
+# ═══════════════════════════════════════════════════════════════════
+# statx(2) syscall numbers – not exposed by the os module
+_SYS_STATX = {"x86_64": 332, "aarch64": 291, "ppc64le": 383}.get(platform.machine())
+_AT_FDCWD = -100
+_AT_SYMLINK_NOFOLLOW = 0x100
+_AT_STATX_DONT_SYNC = 0x4000
+_STATX_SIZE = 0x200
+_libc = None
+
+
+class _StatxTimestamp(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_int64), ("tv_nsec", ctypes.c_uint32),
+                ("__reserved", ctypes.c_int32)]
+
+
+class _Statx(ctypes.Structure):
+    """``struct statx`` from <linux/stat.h> (256 bytes)."""
+    _fields_ = [
+        ("stx_mask", ctypes.c_uint32),
+        ("stx_blksize", ctypes.c_uint32),
+        ("stx_attributes", ctypes.c_uint64),
+        ("stx_nlink", ctypes.c_uint32),
+        ("stx_uid", ctypes.c_uint32),
+        ("stx_gid", ctypes.c_uint32),
+        ("stx_mode", ctypes.c_uint16),
+        ("__spare0", ctypes.c_uint16),
+        ("stx_ino", ctypes.c_uint64),
+        ("stx_size", ctypes.c_uint64),
+        ("stx_blocks", ctypes.c_uint64),
+        ("stx_attributes_mask", ctypes.c_uint64),
+        ("stx_atime", _StatxTimestamp),
+        ("stx_btime", _StatxTimestamp),
+        ("stx_ctime", _StatxTimestamp),
+        ("stx_mtime", _StatxTimestamp),
+        ("stx_rdev_major", ctypes.c_uint32),
+        ("stx_rdev_minor", ctypes.c_uint32),
+        ("stx_dev_major", ctypes.c_uint32),
+        ("stx_dev_minor", ctypes.c_uint32),
+        ("__spare2", ctypes.c_uint64 * 14),
+    ]
+
+
+def _statx_size(path: bytes) -> int:
+    """Return the size of *path* via ``statx(AT_STATX_DONT_SYNC)``.
+
+    On GPFS / NFS a plain ``stat()`` may force a metadata sync with the
+    server; ``AT_STATX_DONT_SYNC`` accepts the locally cached attributes,
+    which is all we need for a size estimate.  Falls back to ``os.stat``
+    when statx is unavailable (non-Linux, old kernel, seccomp, unknown
+    arch) or the filesystem does not report ``STATX_SIZE``.
+    """
+    global _libc, _SYS_STATX
+    if _SYS_STATX is not None and sys.platform.startswith("linux"):
+        try:
+            if _libc is None:
+                _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+            buf = _Statx()
+            rc = _libc.syscall(
+                _SYS_STATX, _AT_FDCWD, path,
+                _AT_SYMLINK_NOFOLLOW | _AT_STATX_DONT_SYNC, _STATX_SIZE,
+                ctypes.byref(buf),
+            )
+            if rc == 0:
+                if buf.stx_mask & _STATX_SIZE:
+                    return buf.stx_size
+            elif ctypes.get_errno() in (errno.ENOSYS, errno.EPERM):
+                # Old kernel or seccomp filter – statx will never work here
+                _SYS_STATX = None
+        except OSError:
+            # libc not loadable – don't try again
+            _SYS_STATX = None
+    return os.stat(path, follow_symlinks=False).st_size
+
+
+def _scan_dir(d: str) -> tuple[int, list[str], list[str]]:
+    """Return ``(bytes in regular files, file names, sub-directory names)`` for *d*."""
+    size, files, subdirs = 0, [], []
+    with os.scandir(d) as it:
+        for entry in it:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    size += _statx_size(os.fsencode(entry.path))
+                    files.append(entry.name)
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+            except OSError:
+                continue
+    return size, files, subdirs
+
+
+def _use_find() -> bool:
+    """True if ``HF_CM_USE_FIND=1`` asks for the GNU ``find`` size walker."""
+    return os.environ.get("HF_CM_USE_FIND") == "1"
+
+
+def _fast_size(path: str) -> Optional[int]:
+    """Sum regular-file sizes under *path* with GNU ``find -printf``.
+
+    ``find`` batches ``getdents`` at C speed, which beats any Python walk
+    on hub caches with hundreds of thousands of blobs.  Returns ``None``
+    if ``find`` is missing, lacks ``-printf`` (BSD / macOS) or fails, so
+    the caller can fall back to the Python walker.
+    """
+    try:
+        proc = subprocess.run(
+            ["find", path, "-type", "f", "-printf", "%s\\n"],
+            capture_output=True, check=False,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    try:
+        return sum(map(int, proc.stdout.splitlines()))
+    except ValueError:
+        return None
+
+
+def _walk_size(root: Path) -> int:
+    """Return the total size in bytes of all regular files under *root*.
+
+    Uses an iterative ``os.scandir`` walk (one ``getdents`` per directory
+    instead of ``rglob`` + ``stat`` per match) and sizes files with
+    :func:`_statx_size` – a big win on GPFS / Lustre.  Symlinks are not
+    followed, so HF snapshot links into ``blobs/`` are not double-counted.
+    With ``HF_CM_USE_FIND=1`` GNU ``find`` is tried first.
+    """
+    if _use_find():
+        size = _fast_size(str(root))
+        if size is not None:
+            return size
+
+    total = 0
+    pending = deque([str(root)])
+    while pending:
+        d = pending.pop()
+        try:
+            size, _, subdirs = _scan_dir(d)
+        except OSError:
+            continue
+        total += size
+        pending.extend(os.path.join(d, name) for name in subdirs)
+    return total
+
+
+def _collect_cleanup(root: Path) -> tuple[list[Path], list[Path]]:
+    """Find ``*.lock`` and ``*.incomplete`` files under *root* in one walk.
+
+    Returns:
+        Tuple of (lock files, incomplete downloads).
+    """
+    locks: list[Path] = []
+    incompletes: list[Path] = []
+    pending = deque([str(root)])
+    while pending:
+        d = pending.pop()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+                    except OSError:
+                        continue
+                    name = entry.name
+                    if name.endswith(".lock"):
+                        locks.append(Path(entry.path))
+                    elif name.endswith(".incomplete"):
+                        incompletes.append(Path(entry.path))
+        except OSError:
+            continue
+    return locks, incompletes
+
+
+def _find_locks(hf_home: Path) -> list[Path]:
+    """Find ``*.lock`` files only where HF libraries create them.
+
+    ``huggingface_hub`` keeps its locks in ``hub/.locks/``; ``datasets``
+    puts builder locks at the top of ``datasets/`` and download locks in
+    ``datasets/downloads/``.  Unlike :func:`_collect_cleanup` this never
+    walks blobs or Arrow shards, so ``status`` stays cheap.
+    """
+    locks, _ = _collect_cleanup(hf_home / "hub" / ".locks")
+    for d in (hf_home / "datasets", hf_home / "datasets" / "downloads"):
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if (entry.name.endswith(".lock")
+                                and entry.is_file(follow_symlinks=False)):
+                            locks.append(Path(entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return locks
+
+
+# Never contain checkpoints of their own – skipped by list_local_models
+_LIST_SKIP_DIRS = frozenset({".git", "blobs", ".cache"})
+
+_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
+def _fmt(n: int) -> str:
+    """Format a byte count, e.g. ``1536`` → ``'1.5 KB'``."""
+    i = min(max(0, (n.bit_length() - 1) // 10), len(_UNITS) - 1)
+    return f"{n / (1 << (10 * i)):.1f} {_UNITS[i]}"
+
+
+def _is_blobs_dir(d: str) -> bool:
+    """True for a hub ``{models,datasets}--X/blobs`` directory."""
+    parent, name = os.path.split(d)
+    return name == "blobs" and os.path.basename(parent).startswith(
+        ("models--", "datasets--"))
+
+
+def _split_names(joined: str) -> list[str]:
+    """Split a NUL-joined name list (NUL can never appear in a file name)."""
+    return joined.split("\0") if joined else []
+
+
+def _index_path(hf_home: Path) -> Path:
+    """Node-local location of the size index for *hf_home*.
+
+    SQLite's WAL mode needs shared memory and reliable locks, which GPFS /
+    Lustre / NFS do not provide across nodes, so the DB lives in the local
+    temp dir (``$TMPDIR`` or ``/tmp``) rather than in the shared HF_HOME
+    itself – inside a per-user ``0700`` directory, so other users cannot
+    plant or read the DB (or its ``-wal`` / ``-shm`` files).
+
+    Raises:
+        OSError: If that directory exists but belongs to someone else or
+            is accessible by others.
+    """
+    key = hashlib.sha1(str(hf_home.resolve()).encode()).hexdigest()[:12]
+    if not hasattr(os, "getuid"):  # Windows: the temp dir is per-user already
+        base = Path(tempfile.gettempdir()) / "hf-cache-index"
+        base.mkdir(exist_ok=True)
+        return base / f"{key}.db"
+
+    uid = os.getuid()
+    base = Path(tempfile.gettempdir()) / f"hf-cache-index-{uid}"
+    base.mkdir(mode=0o700, exist_ok=True)
+    st = os.lstat(base)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != uid or st.st_mode & 0o077:
+        raise OSError(errno.EPERM, "index dir not private to this user", str(base))
+    return base / f"{key}.db"
+
+
+class _CacheIndex:
+    """Persistent SQLite index of per-directory sizes under HF_HOME.
+
+    Each row stores a directory's mtime, the summed size of the regular
+    files directly inside it and the names of its files and
+    sub-directories.  A directory whose mtime is unchanged is not listed
+    again, but its files are re-stat'ed – appending to a file does not
+    touch the parent's mtime.  Hub ``blobs/`` dirs are the exception:
+    blobs are content-addressed and written via ``*.incomplete`` + rename,
+    so an unchanged mtime means unchanged sizes and the row is reused
+    as is – unless it lists ``*.incomplete`` files, which grow in place.
+    A warm hub ``status`` thus costs one ``stat`` per directory.
+
+    Rows for directories modified within :attr:`_RACY_NS` of the scan are
+    not stored: a change in the same timestamp tick would leave the mtime
+    as recorded (git's "racily clean" problem).
+
+    Safe to share between threads.  Call :meth:`save` after the last
+    :meth:`size_of` to persist the results in one write.  A corrupt DB
+    file is deleted and rebuilt.  Other database errors surface as
+    ``sqlite3.Error``; callers fall back to :func:`_walk_size`.
+    """
+
+    _SCHEMA_VERSION = 2
+    _RACY_NS = 2_000_000_000  # coarsest mtime granularity we expect (FAT, some NFS)
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._visited: set[str] = set()
+        self._updates: list[tuple] = []
+        self._corrupt = False
+        try:
+            self.conn = self._open()
+        except sqlite3.OperationalError:
+            raise  # locked or unwritable – not a reason to delete it
+        except sqlite3.DatabaseError:  # "file is not a database" etc.
+            self._discard()
+            self.conn = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        # Short timeout: a concurrent ``status`` holding the write lock
+        # should make us skip persisting, not stall
+        conn = sqlite3.connect(str(self.db_path), timeout=1,
+                               check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self._SCHEMA_VERSION:
+                with conn:
+                    conn.execute("DROP TABLE IF EXISTS dirs")
+                    conn.execute(
+                        "CREATE TABLE dirs ("
+                        " path TEXT PRIMARY KEY,"
+                        " mtime INTEGER NOT NULL,"
+                        " size INTEGER NOT NULL,"
+                        " files TEXT NOT NULL,"
+                        " subdirs TEXT NOT NULL)"
+                    )
+                    conn.execute(f"PRAGMA user_version={self._SCHEMA_VERSION}")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _discard(self):
+        """Delete the DB file and its WAL / shared-memory side files."""
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                Path(f"{self.db_path}{suffix}").unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def close(self):
+        self.conn.close()
+
+    def size_of(self, root: Path) -> int:
+        """Like :func:`_walk_size`, but skips listing unchanged directories."""
+        total = 0
+        updates = []
+        visited = self._visited
+        pending = deque([str(root)])
+        while pending:
+            d = pending.pop()
+            try:
+                mtime = os.stat(d, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                continue
+            racy = time.time_ns() - mtime < self._RACY_NS
+            with self._lock:
+                visited.add(d)
+                try:
+                    row = self.conn.execute(
+                        "SELECT size, files, subdirs FROM dirs WHERE path=? AND mtime=?",
+                        (d, mtime),
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    row = None
+                except sqlite3.DatabaseError:
+                    row, self._corrupt = None, True
+            if row and _is_blobs_dir(d) and not any(
+                    n.endswith(".incomplete") for n in _split_names(row[1])):
+                size, subdirs = row[0], _split_names(row[2])
+            elif row:
+                size, subdirs = 0, _split_names(row[2])
+                for name in _split_names(row[1]):
+                    try:
+                        size += _statx_size(os.fsencode(os.path.join(d, name)))
+                    except OSError:
+                        continue
+                if size != row[0] and not racy:
+                    updates.append((d, mtime, size, row[1], row[2]))
+            else:
+                try:
+                    size, files, subdirs = _scan_dir(d)
+                except OSError:
+                    continue
+                if not racy:
+                    updates.append(
+                        (d, mtime, size, "\0".join(files), "\0".join(subdirs)))
+            total += size
+            pending.extend(os.path.join(d, name) for name in subdirs)
+
+        with self._lock:
+            self._updates += updates
+        return total
+
+    def save(self, *roots: Path):
+        """Write what :meth:`size_of` learned in one transaction.
+
+        Also drops rows under *roots* for directories that no ``size_of``
+        call visited, i.e. that have been deleted or renamed.  If another
+        ``status`` holds the write lock, nothing is persisted this time –
+        the sizes already returned are still correct.  A corrupt DB is
+        deleted instead, so that the next run starts a fresh one; the
+        index cannot be used after that.
+        """
+        if self._corrupt:
+            self._drop()
+            return
+        try:
+            with self._lock, self.conn:
+                if self._updates:
+                    self.conn.executemany(
+                        "INSERT INTO dirs (path, mtime, size, files, subdirs)"
+                        " VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(path) DO UPDATE SET mtime=excluded.mtime,"
+                        " size=excluded.size, files=excluded.files,"
+                        " subdirs=excluded.subdirs",
+                        self._updates,
+                    )
+                gone = []
+                for root in map(str, roots):
+                    # Everything strictly below root sorts between "root/" and "root0"
+                    stored = self.conn.execute(
+                        "SELECT path FROM dirs WHERE path=? OR (path>? AND path<?)",
+                        (root, root + os.sep, root + chr(ord(os.sep) + 1)),
+                    ).fetchall()
+                    gone += [(p,) for (p,) in stored if p not in self._visited]
+                if gone:
+                    self.conn.executemany("DELETE FROM dirs WHERE path=?", gone)
+        except sqlite3.OperationalError:
+            pass
+        except sqlite3.DatabaseError:
+            self._drop()
+        self._updates, self._visited = [], set()
+
+    def _drop(self):
+        self.conn.close()
+        self._discard()
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Download lists
+# ═══════════════════════════════════════════════════════════════════
+def _parse_list_line(
+    raw: str,
+) -> Optional[tuple[str, str, Optional[str], Optional[str]]]:
+    """Parse one line of a ``download-from-file`` list.
+
+    Returns:
+        ``None`` for blank and comment lines, else ``(kind, repo_id,
+        config, split)`` where *kind* is ``"model"`` or ``"dataset"``
+        and config / split are ``None`` when not given.
+
+    Raises:
+        ValueError: For a ``dataset:`` line without a name or with more
+            than ``name,config,split``.
+    """
+    line = raw.strip()
+    if not line or line.startswith("#"):
+        return None
+    head, sep, rest = line.partition(":")
+    if head != "dataset" or not sep:
+        return ("model", line, None, None)
+    parts = [p.strip() for p in rest.split(",")]
+    if len(parts) > 3 or not parts[0]:
+        raise ValueError(f"expected dataset:name[,config[,split]], got {line!r}")
+    parts += [""] * (3 - len(parts))
+    return ("dataset", parts[0], parts[1] or None, parts[2] or None)
+
+
 class HFCacheManager:
     """Manages HuggingFace model and dataset caching on HPC clusters.
 
@@ -100,14 +585,27 @@ class HFCacheManager:
         self.assets_cache = self.hf_home / "assets"
         self.xet_cache = self.hf_home / "xet"
 
-        # Create directories
-        for d in [self.hf_home, self.hub_cache, self.datasets_cache,
-                  self.assets_cache, self.xet_cache]:
-            d.mkdir(parents=True, exist_ok=True)
+        # Two stats instead of five mkdirs on the common start-up path
+        # (costly on GPFS under many Slurm jobs).  Checking the dirs
+        # themselves, not a sentinel, recreates them after an rm -rf.
+        if not (self.hub_cache.is_dir() and self.datasets_cache.is_dir()):
+            for d in [self.hf_home, self.hub_cache, self.datasets_cache,
+                      self.assets_cache, self.xet_cache]:
+                d.mkdir(parents=True, exist_ok=True)
 
         # Detect environment via cluster.py
         self._env_name = _detect_cluster_summary()
 
+        # Resolved lazily by _get_token()
+        self._token_cache: object = _SENTINEL
+
+        # Set by setup_environment() so batch downloads apply it only once
+        self._env_applied = False
+        self._env_offline = False
+
+        # Serialises output from concurrent downloads (see _print_block)
+        self._print_lock = threading.Lock()
+
         print(f"✅ HFCacheManager initialised")
         print(f"   Environment   : {self._env_name}")
         print(f"   HF_HOME       : {self.hf_home}")
@@ -125,13 +623,36 @@ class HFCacheManager:
             if os.environ.get(var):
                 return f"✅ token set via ${var}"
         try:
-            from huggingface_hub import HfFolder
-            if HfFolder.get_token():
+            if _get_hf_hub().HfFolder.get_token():
                 return "✅ token found (huggingface-cli login)"
         except Exception:
             pass
         return "⚠️  no token — run 'login' command or set HF_TOKEN for gated models"
 
+    def _print_block(self, lines: list[str]):
+        """Print *lines* as one uninterrupted block (thread-safe)."""
+        with self._print_lock:
+            print("\n".join(lines), flush=True)
+
+    def _scan_hub(self) -> tuple[list[str], list[str]]:
+        """List ``hub/`` once and split it into ``models--*`` and ``datasets--*`` dirs.
+
+        Returns:
+            Tuple of (model dirs, dataset dirs), each sorted by path.
+        """
+        models: list[str] = []
+        datasets: list[str] = []
+        try:
+            with os.scandir(self.hub_cache) as it:
+                for entry in it:
+                    if entry.name.startswith("models--"):
+                        models.append(entry.path)
+                    elif entry.name.startswith("datasets--"):
+                        datasets.append(entry.path)
+        except OSError:
+            pass
+        return sorted(models), sorted(datasets)
+
     # ───────────────────────────────────────────────────────────────
     #  Environment
     # ───────────────────────────────────────────────────────────────
@@ -145,6 +666,10 @@ class HFCacheManager:
             offline: Set ``*_OFFLINE=1`` vars (for compute nodes).
             verbose: Print summary.
         """
+        # Already applied (offline vars are only ever added, never removed)
+        if self._env_applied and not verbose and (self._env_offline or not offline):
+            return
+
         env = {
             "HF_HOME": str(self.hf_home),
             "HF_HUB_CACHE": str(self.hub_cache),
@@ -166,6 +691,8 @@ class HFCacheManager:
             })
 
         os.environ.update(env)
+        self._env_applied = True
+        self._env_offline = self._env_offline or offline
 
         if verbose:
             mode = "OFFLINE" if offline else "ONLINE"
@@ -181,20 +708,26 @@ class HFCacheManager:
     #  HuggingFace token management
     # ───────────────────────────────────────────────────────────────
     def _get_token(self) -> Optional[str]:
-        """Return the current HF token from env vars or huggingface-cli cache, or None."""
+        """Return the current HF token from env vars or huggingface-cli cache, or None.
+
+        The lookup runs once per manager and is cached; :meth:`ensure_token`
+        updates the cache when it exports a new token.
+        """
+        if self._token_cache is not _SENTINEL:
+            return self._token_cache
+        tok = None
         for var in ("HF_TOKEN", "HUGGINGFACE_HUB_TOKEN"):
             tok = os.environ.get(var)
             if tok:
-                return tok
-        # Check the stored token from `huggingface-cli login`
-        try:
-            from huggingface_hub import HfFolder
-            tok = HfFolder.get_token()
-            if tok:
-                return tok
-        except Exception:
-            pass
-        return None
+                break
+        else:
+            # Check the stored token from `huggingface-cli login`
+            try:
+                tok = _get_hf_hub().HfFolder.get_token() or None
+            except Exception:
+                tok = None
+        self._token_cache = tok
+        return tok
 
     def validate_token(self, token: Optional[str] = None) -> bool:
         """Validate a HuggingFace token and display user information.
@@ -205,7 +738,7 @@ class HFCacheManager:
         Returns:
             ``True`` if the token is valid.
         """
-        from huggingface_hub import HfApi
+        HfApi = _get_hf_hub().HfApi
 
         tok = token or self._get_token()
         try:
@@ -263,6 +796,7 @@ class HFCacheManager:
 
         # Persist for this process and child processes
         os.environ["HF_TOKEN"] = token
+        self._token_cache = token
         print(f"   Token exported as HF_TOKEN for this session.\n")
         return token
 
@@ -297,13 +831,29 @@ class HFCacheManager:
 
         # Ensure we have a token (prompts interactively if missing)
         token = self.ensure_token()
+        return self._snapshot_model(model_name, revision, ignore_patterns, token)
+
+    def _snapshot_model(
+        self,
+        model_name: str,
+        revision: str = "main",
+        ignore_patterns: Optional[list[str]] = None,
+        token: Optional[str] = None,
+    ) -> bool:
+        """Run ``snapshot_download`` for one model (no env setup, no prompts).
 
-        from huggingface_hub import snapshot_download
+        Safe to call from worker threads – see :meth:`download_from_file`.
+        """
+        snapshot_download = _get_hf_hub().snapshot_download
 
-        print(f"📥 Downloading model: {model_name}  (revision={revision})")
+        # Each block is printed in one go under a lock so that concurrent
+        # downloads don't interleave their lines
+        out = [f"📥 Downloading model: {model_name}  (revision={revision})"]
         if ignore_patterns:
-            print(f"   Ignoring: {ignore_patterns}")
+            out.append(f"   Ignoring: {ignore_patterns}")
+        self._print_block(out)
 
+        out = []
         try:
             path = snapshot_download(
                 repo_id=model_name,
@@ -311,27 +861,29 @@ class HFCacheManager:
                 cache_dir=self.hub_cache,
                 ignore_patterns=ignore_patterns,
                 token=token,
+                max_workers=8,
             )
-            print(f"✅ Model cached at {path}")
+            self._print_block([f"✅ Model cached: {model_name} → {path}"])
             return True
         except Exception as e:
             err_str = str(e)
             if "401" in err_str or "gated" in err_str.lower() or "restricted" in err_str.lower():
-                print(f"\n❌ Authentication failed for: {model_name}")
-                print(f"   This is a gated model that requires approval.\n")
-                print(f"   To fix this:")
-                print(f"   1. Go to https://huggingface.co/{model_name}")
-                print(f"   2. Accept the license / request access")
-                print(f"   3. Make sure your token has 'read' scope")
-                print(f"   4. Re-run this command")
+                out.append(f"\n❌ Authentication failed for: {model_name}")
+                out.append(f"   This is a gated model that requires approval.\n")
+                out.append(f"   To fix this:")
+                out.append(f"   1. Go to https://huggingface.co/{model_name}")
+                out.append(f"   2. Accept the license / request access")
+                out.append(f"   3. Make sure your token has 'read' scope")
+                out.append(f"   4. Re-run this command")
                 if not token:
-                    print(f"\n   ⚠️  You also have NO token set.")
-                    print(f"   Run: python {__file__} login")
+                    out.append(f"\n   ⚠️  You also have NO token set.")
+                    out.append(f"   Run: python {__file__} login")
             elif "404" in err_str:
-                print(f"\n❌ Model not found: {model_name}")
-                print(f"   Check the model name at https://huggingface.co/{model_name}")
+                out.append(f"\n❌ Model not found: {model_name}")
+                out.append(f"   Check the model name at https://huggingface.co/{model_name}")
             else:
-                print(f"\n❌ Error downloading model: {e}")
+                out.append(f"\n❌ Error downloading model {model_name}: {e}")
+            self._print_block(out)
             return False
 
     # ───────────────────────────────────────────────────────────────
@@ -418,8 +970,12 @@ class HFCacheManager:
             dataset:cais/mmlu,all
             dataset:trl-lib/Capybara,,train
 
-        Lines starting with ``dataset:`` are treated as datasets.
-        Everything else is treated as a model.
+        Lines starting with ``dataset:`` are treated as datasets;
+        malformed ones (no name, more than three fields) are skipped and
+        counted as failures.  Everything else is treated as a model.  Up
+        to four models are downloaded concurrently; datasets follow one
+        at a time.  On Ctrl-C, queued models are cancelled right away;
+        the ones already downloading finish before the process exits.
 
         Args:
             filepath: Path to the text file.
@@ -432,30 +988,56 @@ class HFCacheManager:
             print(f"❌ File not found: {filepath}")
             return (0, 1)
 
-        # Ensure token is available before starting the batch
-        self.ensure_token()
-
-        successes, failures = 0, 0
+        self.setup_environment(offline=False, verbose=False)
 
-        for raw_line in path.read_text().splitlines():
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
+        # Ensure token is available before starting the batch
+        token = self.ensure_token()
 
-            if line.startswith("dataset:"):
-                # Parse: dataset:name[,config[,split]]
-                parts = line[len("dataset:"):].split(",")
-                ds_name = parts[0].strip()
-                ds_config = parts[1].strip() if len(parts) > 1 and parts[1].strip() else None
-                ds_split = parts[2].strip() if len(parts) > 2 and parts[2].strip() else None
-                ok = self.download_dataset(ds_name, name=ds_config, split=ds_split)
-            else:
-                ok = self.download_model(line)
+        models: list[str] = []
+        datasets: list[tuple[str, Optional[str], Optional[str]]] = []
+        invalid = 0
+
+        with path.open() as f:
+            for lineno, raw_line in enumerate(f, 1):
+                try:
+                    entry = _parse_list_line(raw_line)
+                except ValueError as e:
+                    print(f"⚠️  {path}:{lineno}: {e} – skipped")
+                    invalid += 1
+                    continue
+                if entry is None:
+                    continue
+                kind, repo_id, ds_config, ds_split = entry
+                if kind == "dataset":
+                    datasets.append((repo_id, ds_config, ds_split))
+                else:
+                    models.append(repo_id)
+
+        results: list[bool] = []
+
+        # Models: several repos in flight at once, each with its own
+        # snapshot_download file workers, to overlap per-file round-trips
+        if models:
+            ex = ThreadPoolExecutor(max_workers=min(4, len(models)))
+            futures = [ex.submit(self._snapshot_model, m, token=token) for m in models]
+            try:
+                results += [f.result() for f in futures]
+            except KeyboardInterrupt:
+                # Don't wait for the whole queue – only the repos in flight
+                ex.shutdown(wait=False, cancel_futures=True)
+                print("\n⚠️  Interrupted – queued models cancelled, "
+                      "waiting for downloads in progress...")
+                raise
+            ex.shutdown()
+
+        # Datasets: load_dataset also builds the Arrow cache – keep serial
+        for ds_name, ds_config, ds_split in datasets:
+            results.append(
+                self.download_dataset(ds_name, name=ds_config, split=ds_split)
+            )
 
-            if ok:
-                successes += 1
-            else:
-                failures += 1
+        successes = sum(results)
+        failures = len(results) - successes + invalid
 
         print(f"\n{'='*50}")
         print(f"📋 Batch complete: {successes} succeeded, {failures} failed")
@@ -470,6 +1052,9 @@ class HFCacheManager:
 
         Useful for discovering your own fine-tuned checkpoints.  Pass the
         returned paths directly to ``oellm schedule-eval --models <path>``.
+        Checkpoints nested in another (e.g. HF Trainer's
+        ``run/checkpoint-500/`` next to ``run/model.safetensors``) are
+        found too; ``.git``, ``blobs`` and ``.cache`` are skipped.
 
         Args:
             directory: Root directory to search.
@@ -482,11 +1067,28 @@ class HFCacheManager:
             print(f"⚠️  Directory does not exist: {root}")
             return []
 
+        # Iterative DFS, one scandir per directory; a directory holding
+        # safetensors is a checkpoint, but may still contain others
         found: list[Path] = []
-        for p in sorted(root.rglob("*.safetensors")):
-            model_dir = p.parent
-            if model_dir not in found:
-                found.append(model_dir)
+        pending = deque([str(root)])
+        while pending:
+            d = pending.pop()
+            subdirs: list[str] = []
+            has_weights = False
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.name.endswith(".safetensors"):
+                            has_weights = True
+                        elif (entry.name not in _LIST_SKIP_DIRS
+                                and entry.is_dir(follow_symlinks=False)):
+                            subdirs.append(entry.path)
+            except OSError:
+                continue
+            if has_weights:
+                found.append(Path(d))
+            pending.extend(subdirs)
+        found.sort()
 
         if found:
             print(f"🔍 Found {len(found)} model(s) under {root}:")
@@ -500,26 +1102,56 @@ class HFCacheManager:
     # ───────────────────────────────────────────────────────────────
     #  Cache stats
     # ───────────────────────────────────────────────────────────────
-    def get_cache_stats(self) -> dict:
-        """Get cache usage statistics."""
+    def _measure(self) -> tuple[dict[str, int], dict[str, int], int]:
+        """Size every hub repo and dataset dir once, via the index if possible.
+
+        Hub repos are sized from ``blobs/`` only – ``snapshots/`` is all
+        symlinks into it and ``refs/`` is a few bytes.  Both the totals and
+        the per-repo listing of :meth:`print_cache_status` come from here.
+
+        Returns:
+            Tuple of (model dir → size, dataset dir → size, bytes in loose
+            files directly under ``datasets/``).
+        """
+        models, _ = self._scan_hub()
+        try:
+            loose, _, names = _scan_dir(str(self.datasets_cache))
+        except OSError:
+            loose, names = 0, []
+        ds_dirs = sorted(os.path.join(self.datasets_cache, n) for n in names)
+        targets = [Path(m) / "blobs" for m in models] + [Path(d) for d in ds_dirs]
+
+        def _size_all(size_of) -> list[int]:
+            if not targets:
+                return []
+            with ThreadPoolExecutor(max_workers=min(32, len(targets))) as ex:
+                return list(ex.map(size_of, targets))
+
+        sizes = None
+        if not _use_find():  # HF_CM_USE_FIND=1 opts into a full native walk
+            try:
+                index = _CacheIndex(_index_path(self.hf_home))
+            except (sqlite3.Error, OSError):
+                index = None
+            if index is not None:
+                try:
+                    sizes = _size_all(index.size_of)
+                    index.save(self.hub_cache, self.datasets_cache)
+                except sqlite3.Error:
+                    sizes = None  # unusable index – fall back to a full walk
+                finally:
+                    index.close()
+        if sizes is None:
+            sizes = _size_all(_walk_size)
+
+        n = len(models)
+        return dict(zip(models, sizes[:n])), dict(zip(ds_dirs, sizes[n:])), loose
 
-        def _size(path: Path) -> int:
-            total = 0
-            if path.exists():
-                for entry in path.rglob("*"):
-                    if entry.is_file():
-                        total += entry.stat().st_size
-            return total
-
-        def _fmt(n: int) -> str:
-            for unit in ("B", "KB", "MB", "GB", "TB"):
-                if n < 1024:
-                    return f"{n:.1f} {unit}"
-                n /= 1024
-            return f"{n:.1f} PB"
-
-        hub = _size(self.hub_cache)
-        ds = _size(self.datasets_cache)
+    @staticmethod
+    def _stats_from(models: dict[str, int], datasets: dict[str, int], loose: int) -> dict:
+        """Build the :meth:`get_cache_stats` dict from :meth:`_measure` output."""
+        hub = sum(models.values())
+        ds = sum(datasets.values()) + loose
         return {
             "hub_size": hub,
             "hub_size_str": _fmt(hub),
@@ -529,26 +1161,14 @@ class HFCacheManager:
             "total_size_str": _fmt(hub + ds),
         }
 
+    def get_cache_stats(self) -> dict:
+        """Get cache usage statistics."""
+        return self._stats_from(*self._measure())
+
     def print_cache_status(self):
         """Print human-friendly cache summary."""
-        import glob
-
-        def _dir_size(path: Path) -> int:
-            total = 0
-            if path.exists():
-                for entry in path.rglob("*"):
-                    if entry.is_file():
-                        total += entry.stat().st_size
-            return total
-
-        def _fmt(n: int) -> str:
-            for unit in ("B", "KB", "MB", "GB", "TB"):
-                if n < 1024:
-                    return f"{n:.1f} {unit}"
-                n /= 1024
-            return f"{n:.1f} PB"
-
-        stats = self.get_cache_stats()
+        models, datasets, loose = self._measure()
+        stats = self._stats_from(models, datasets, loose)
         print("📊 Cache Status")
         print(f"   Environment : {self._env_name}")
         print(f"   HF_HOME     : {self.hf_home}")
@@ -558,27 +1178,23 @@ class HFCacheManager:
         print(f"   Total       : {stats['total_size_str']}")
 
         # List cached model snapshots with individual sizes
-        snapshots = sorted(glob.glob(str(self.hub_cache / "models--*")))
-        if snapshots:
-            print(f"\n   📦 Cached models ({len(snapshots)}):")
-            for s in snapshots:
+        if models:
+            print(f"\n   📦 Cached models ({len(models)}):")
+            for s, size in models.items():
                 name = Path(s).name.replace("models--", "").replace("--", "/")
-                size = _fmt(_dir_size(Path(s)))
-                print(f"     • {name}  ({size})")
+                print(f"     • {name}  ({_fmt(size)})")
 
         # List cached datasets
-        ds_dirs = sorted(glob.glob(str(self.datasets_cache / "*")))
-        ds_dirs = [d for d in ds_dirs if Path(d).is_dir()
-                   and not Path(d).name.startswith(".")]
+        ds_dirs = {d: size for d, size in datasets.items()
+                   if not Path(d).name.startswith(".")}
         if ds_dirs:
             print(f"\n   📂 Cached datasets ({len(ds_dirs)}):")
-            for d in ds_dirs:
+            for d, size in ds_dirs.items():
                 name = Path(d).name.replace("___", "/")
-                size = _fmt(_dir_size(Path(d)))
-                print(f"     • {name}  ({size})")
+                print(f"     • {name}  ({_fmt(size)})")
 
         # Check for stale lock files
-        locks = list(self.hf_home.rglob("*.lock"))
+        locks = _find_locks(self.hf_home)
         if locks:
             print(f"\n   ⚠️  {len(locks)} stale lock file(s) found")
             print(f"      Run: python bin/hf_cache_manager.py clean")
@@ -596,38 +1212,49 @@ class HFCacheManager:
             Number of items cleaned.
         """
         cleaned = 0
+        locks, incompletes = _collect_cleanup(self.hf_home)
 
         # Remove .lock files
-        locks = list(self.hf_home.rglob("*.lock"))
         if locks:
             print(f"🔒 Found {len(locks)} lock file(s):")
             for lf in locks:
                 print(f"   {'[DRY RUN] ' if dry_run else ''}rm {lf}")
-                if not dry_run:
-                    lf.unlink()
                 cleaned += 1
 
         # Remove incomplete downloads (.incomplete in hub)
-        incompletes = list(self.hub_cache.rglob("*.incomplete"))
+        incompletes = [p for p in incompletes if self.hub_cache in p.parents]
         if incompletes:
             print(f"⚠️  Found {len(incompletes)} incomplete download(s):")
             for inc in incompletes:
                 print(f"   {'[DRY RUN] ' if dry_run else ''}rm {inc}")
-                if not dry_run:
-                    inc.unlink()
                 cleaned += 1
 
+        # Each unlink is a metadata-server round-trip – overlap them
+        to_unlink = locks + incompletes
+        if to_unlink and not dry_run:
+            with ThreadPoolExecutor(max_workers=min(16, len(to_unlink))) as ex:
+                list(ex.map(lambda p: p.unlink(missing_ok=True), to_unlink))
+
         # Remove misplaced datasets-- entries in hub/
-        import glob as _glob
-        misplaced = sorted(_glob.glob(str(self.hub_cache / "datasets--*")))
+        _, misplaced = self._scan_hub()
         if misplaced:
-            import shutil
             print(f"🔀 Found {len(misplaced)} misplaced dataset(s) in hub/:")
             for mp in misplaced:
                 print(f"   {'[DRY RUN] ' if dry_run else ''}rm -rf {mp}")
-                if not dry_run:
-                    shutil.rmtree(mp)
-                cleaned += 1
+            if dry_run:
+                cleaned += len(misplaced)
+            else:
+                with ThreadPoolExecutor(max_workers=min(8, len(misplaced))) as ex:
+                    list(ex.map(
+                        lambda p: shutil.rmtree(p, ignore_errors=True), misplaced,
+                    ))
+                # ignore_errors hides failures – count what is actually gone
+                remaining = [mp for mp in misplaced if os.path.lexists(mp)]
+                cleaned += len(misplaced) - len(remaining)
+                if remaining:
+                    print(f"❌ Could not remove {len(remaining)} dir(s) (check permissions):")
+                    for mp in remaining:
+                        print(f"   {mp}")
 
         if cleaned == 0:
             print("✅ Cache is clean – nothing to remove.")
@@ -674,9 +1301,15 @@ class HFCacheManager:
         else:
             safe_name = model_name.replace("/", "--")
             cached = self.hub_cache / f"models--{safe_name}"
-            if cached.exists():
-                snap_dir = cached / "snapshots"
-                snaps = list(snap_dir.iterdir()) if snap_dir.exists() else []
+            if os.path.lexists(cached):
+                # Snapshot contents are symlinks into blobs/ – list the
+                # revision dirs without dereferencing anything
+                try:
+                    with os.scandir(cached / "snapshots") as it:
+                        snaps = [e.name for e in it
+                                 if e.is_dir(follow_symlinks=False)]
+                except OSError:
+                    snaps = []
                 if snaps:
                     print(f"✅ Model cached: {model_name}  ({len(snaps)} snapshot(s))")
                 else:
@@ -788,15 +1421,24 @@ def main():
                 print(f"❌ File not found: {args.filepath}")
                 sys.exit(1)
             print("🔍 Dry run – would download:")
-            for raw_line in path.read_text().splitlines():
-                line = raw_line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                if line.startswith("dataset:"):
-                    print(f"   📂 dataset: {line[len('dataset:'):]}") 
-                else:
-                    print(f"   📦 model:   {line}")
-            sys.exit(0)
+            invalid = 0
+            with path.open() as f:
+                for lineno, raw_line in enumerate(f, 1):
+                    try:
+                        entry = _parse_list_line(raw_line)
+                    except ValueError as e:
+                        print(f"   ⚠️  line {lineno}: {e} – would be skipped")
+                        invalid += 1
+                        continue
+                    if entry is None:
+                        continue
+                    kind, repo_id, ds_config, ds_split = entry
+                    if kind == "dataset":
+                        spec = ",".join([repo_id, ds_config or "", ds_split or ""])
+                        print(f"   📂 dataset: {spec.rstrip(',')}")
+                    else:
+                        print(f"   📦 model:   {repo_id}")
+            sys.exit(1 if invalid else 0)
         successes, failures = hf.download_from_file(args.filepath)
         sys.exit(0 if failures == 0 else 1)
 
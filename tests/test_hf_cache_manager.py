@@ -0,0 +1,463 @@
+"""Tests for the filesystem helpers in cluster_utils.hf_cache_manager."""
+
+import ctypes
+import errno
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+from cluster_utils import hf_cache_manager as hcm
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux") or hcm._SYS_STATX is None,
+    reason="statx syscall only available on Linux",
+)
+
+
+# ───────────────────────────────────────────────────────────────────
+#  statx
+# ───────────────────────────────────────────────────────────────────
+def test_statx_struct_layout():
+    # Must match struct statx in <linux/stat.h>
+    assert ctypes.sizeof(hcm._Statx) == 256
+    assert hcm._Statx.stx_mask.offset == 0
+    assert hcm._Statx.stx_ino.offset == 32
+    assert hcm._Statx.stx_size.offset == 40
+    assert hcm._Statx.stx_mtime.offset == 112
+
+
+@linux_only
+def test_statx_size_matches_os_stat(tmp_path):
+    f = tmp_path / "blob"
+    f.write_bytes(b"x" * 12345)
+    assert hcm._statx_size(os.fsencode(f)) == 12345
+    assert hcm._SYS_STATX is not None
+
+
+@linux_only
+def test_statx_size_does_not_follow_symlinks(tmp_path):
+    target = tmp_path / "blob"
+    target.write_bytes(b"x" * 5000)
+    link = tmp_path / "link"
+    link.symlink_to(target)
+    assert hcm._statx_size(os.fsencode(link)) == os.lstat(link).st_size
+
+
+@pytest.mark.parametrize("err", [errno.ENOSYS, errno.EPERM])
+def test_statx_disabled_after_permanent_failure(tmp_path, monkeypatch, err):
+    class FakeLibc:
+        calls = 0
+
+        def syscall(self, *args):
+            FakeLibc.calls += 1
+            ctypes.set_errno(err)
+            return -1
+
+    monkeypatch.setattr(hcm, "_libc", FakeLibc())
+    monkeypatch.setattr(hcm, "_SYS_STATX", 332)
+    monkeypatch.setattr(hcm.sys, "platform", "linux")
+    f = tmp_path / "blob"
+    f.write_bytes(b"x" * 10)
+
+    assert hcm._statx_size(os.fsencode(f)) == 10
+    assert hcm._statx_size(os.fsencode(f)) == 10
+    assert FakeLibc.calls == 1
+    assert hcm._SYS_STATX is None
+
+
+def test_statx_ignores_size_missing_from_mask(tmp_path, monkeypatch):
+    class FakeLibc:
+        def syscall(self, *args):
+            buf = args[-1]._obj
+            buf.stx_mask = 0
+            buf.stx_size = 999
+            return 0
+
+    monkeypatch.setattr(hcm, "_libc", FakeLibc())
+    monkeypatch.setattr(hcm, "_SYS_STATX", 332)
+    monkeypatch.setattr(hcm.sys, "platform", "linux")
+    f = tmp_path / "blob"
+    f.write_bytes(b"x" * 10)
+
+    assert hcm._statx_size(os.fsencode(f)) == 10
+
+
+# ───────────────────────────────────────────────────────────────────
+#  SQLite size index
+# ───────────────────────────────────────────────────────────────────
+@pytest.fixture
+def index(tmp_path):
+    idx = hcm._CacheIndex(tmp_path / "index.db")
+    yield idx
+    idx.close()
+
+
+def _size(index, root):
+    """One ``status``-style pass: size, then persist."""
+    size = index.size_of(root)
+    index.save(root)
+    return size
+
+
+def _backdate(*dirs):
+    """Move mtimes out of the index's racily-clean window."""
+    t = time.time() - 60
+    for d in dirs:
+        os.utime(d, (t, t))
+
+
+def _make_hub_repo(hub, name, blobs):
+    repo = hub / f"models--{name}"
+    (repo / "blobs").mkdir(parents=True)
+    (repo / "snapshots" / "abc").mkdir(parents=True)
+    for i, size in enumerate(blobs):
+        blob = repo / "blobs" / f"sha{i}"
+        blob.write_bytes(b"x" * size)
+        (repo / "snapshots" / "abc" / f"f{i}").symlink_to(blob)
+    _backdate(repo / "blobs", repo / "snapshots" / "abc")
+    return repo
+
+
+def test_index_matches_walk(tmp_path, index):
+    hub = tmp_path / "hub"
+    _make_hub_repo(hub, "org--a", [100, 200])
+    _make_hub_repo(hub, "org--b", [5000])
+    assert _size(index, hub) == hcm._walk_size(hub) == 5300
+    assert _size(index, hub) == 5300
+
+
+def test_index_sees_appended_file(tmp_path, index):
+    ds = tmp_path / "datasets" / "foo___bar"
+    ds.mkdir(parents=True)
+    (ds / "a.arrow").write_bytes(b"x" * 3000)
+    (ds / "b.arrow").write_bytes(b"x" * 7000)
+    _backdate(ds)
+    assert _size(index, ds) == 10000
+
+    with open(ds / "b.arrow", "ab") as f:  # parent mtime unchanged
+        f.write(b"x" * 10000)
+    assert _size(index, ds) == 20000
+
+
+def test_index_sees_nested_file(tmp_path, index):
+    ds = tmp_path / "datasets" / "foo___bar"
+    deep = ds / "default" / "0.0.0" / "abc"
+    deep.mkdir(parents=True)
+    (deep / "a.arrow").write_bytes(b"x" * 20000)
+    assert _size(index, ds) == 20000
+
+    (deep / "b.arrow").write_bytes(b"x" * 50000)
+    assert _size(index, ds) == 70000
+
+
+def test_index_reuses_unchanged_blobs_dirs(tmp_path, index, monkeypatch):
+    hub = tmp_path / "hub"
+    _make_hub_repo(hub, "org--a", [100] * 50)
+    assert _size(index, hub) == 5000
+
+    calls = []
+    real = hcm._statx_size
+    monkeypatch.setattr(hcm, "_statx_size", lambda p: calls.append(p) or real(p))
+    assert _size(index, hub) == 5000
+    assert calls == []
+
+
+def test_index_does_not_store_racily_clean_dirs(tmp_path, index):
+    blobs = _make_hub_repo(tmp_path / "hub", "org--a", [100]) / "blobs"
+    t = time.time()
+    os.utime(blobs, (t, t))
+    assert _size(index, blobs) == 100
+
+    (blobs / "sha1").write_bytes(b"x" * 1000)
+    os.utime(blobs, (t, t))  # second write in the same timestamp tick
+    assert _size(index, blobs) == 1100
+
+
+def test_index_restats_incomplete_blobs(tmp_path, index):
+    blobs = _make_hub_repo(tmp_path / "hub", "org--a", [100]) / "blobs"
+    (blobs / "sha1.incomplete").write_bytes(b"x" * 10)
+    _backdate(blobs)
+    assert _size(index, blobs) == 110
+
+    with open(blobs / "sha1.incomplete", "ab") as f:  # download in progress
+        f.write(b"x" * 1000)
+    assert _size(index, blobs) == 1110
+
+
+def test_index_rebuilds_corrupt_db(tmp_path):
+    db = tmp_path / "index.db"
+    db.write_bytes(b"not a database" * 100)
+    (tmp_path / "index.db-wal").write_bytes(b"junk")
+    ds = tmp_path / "ds"
+    ds.mkdir()
+    (ds / "a").write_bytes(b"x" * 42)
+    _backdate(ds)
+
+    idx = hcm._CacheIndex(db)
+    try:
+        assert _size(idx, ds) == 42
+        assert idx.conn.execute("SELECT size FROM dirs").fetchall() == [(42,)]
+    finally:
+        idx.close()
+
+
+def test_index_drops_db_corrupted_while_open(tmp_path, index, monkeypatch):
+    ds = tmp_path / "ds"
+    ds.mkdir()
+    (ds / "a").write_bytes(b"x" * 42)
+
+    class Broken:
+        def execute(self, *args):
+            raise sqlite3.DatabaseError("database disk image is malformed")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(index, "conn", Broken())
+    assert _size(index, ds) == 42
+    assert not (tmp_path / "index.db").exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX ownership check")
+def test_index_path_is_private(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = hcm._index_path(tmp_path / "hf")
+    base = path.parent
+    assert base.name == f"hf-cache-index-{os.getuid()}"
+    assert base.stat().st_mode & 0o777 == 0o700
+
+    base.chmod(0o777)  # e.g. pre-created by someone else
+    with pytest.raises(OSError):
+        hcm._index_path(tmp_path / "hf")
+
+
+def test_index_prunes_deleted_dirs(tmp_path, index):
+    hub = tmp_path / "hub"
+    _make_hub_repo(hub, "org--a", [100])
+    repo_b = _make_hub_repo(hub, "org--b", [200])
+    _size(index, hub)
+    shutil.rmtree(repo_b)
+
+    assert _size(index, hub) == 100
+    paths = [p for (p,) in index.conn.execute("SELECT path FROM dirs")]
+    assert paths and not any("org--b" in p for p in paths)
+
+
+def test_index_survives_locked_db(tmp_path, index):
+    ds = tmp_path / "ds"
+    ds.mkdir()
+    (ds / "a").write_bytes(b"x" * 42)
+
+    other = sqlite3.connect(str(tmp_path / "index.db"), timeout=0)
+    other.execute("BEGIN IMMEDIATE")  # hold the write lock
+    try:
+        assert _size(index, ds) == 42
+    finally:
+        other.rollback()
+        other.close()
+
+
+# ───────────────────────────────────────────────────────────────────
+#  Download lists
+# ───────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize("line, expected", [
+    ("  # comment", None),
+    ("", None),
+    ("Qwen/Qwen2.5-0.5B-Instruct\n", ("model", "Qwen/Qwen2.5-0.5B-Instruct", None, None)),
+    ("dataset:hellaswag", ("dataset", "hellaswag", None, None)),
+    ("dataset:cais/mmlu, all", ("dataset", "cais/mmlu", "all", None)),
+    ("dataset:trl-lib/Capybara,,train", ("dataset", "trl-lib/Capybara", None, "train")),
+    ("datasets:foo", ("model", "datasets:foo", None, None)),
+])
+def test_parse_list_line(line, expected):
+    assert hcm._parse_list_line(line) == expected
+
+
+@pytest.mark.parametrize("line", ["dataset:a,b,c,d", "dataset:", "dataset:,cfg"])
+def test_parse_list_line_rejects_malformed_dataset(line):
+    with pytest.raises(ValueError):
+        hcm._parse_list_line(line)
+
+
+# ───────────────────────────────────────────────────────────────────
+#  HFCacheManager
+# ───────────────────────────────────────────────────────────────────
+def test_list_local_models_finds_nested_trainer_checkpoints(tmp_path, capsys):
+    run = tmp_path / "run"
+    for d in (run, run / "checkpoint-500", run / "checkpoint-1000"):
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "model.safetensors").write_bytes(b"x")
+    (run / ".git" / "lfs").mkdir(parents=True)
+    (run / ".git" / "lfs" / "model.safetensors").write_bytes(b"x")
+
+    found = hcm.HFCacheManager.list_local_models(str(tmp_path))
+    assert found == [run, run / "checkpoint-1000", run / "checkpoint-500"]
+
+
+@pytest.fixture
+def hf(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    hf = hcm.HFCacheManager(str(tmp_path / "hf"))
+    _make_hub_repo(hf.hub_cache, "org--a", [1000])
+    (hf.datasets_cache / "foo___bar").mkdir()
+    (hf.datasets_cache / "foo___bar" / "a.arrow").write_bytes(b"x" * 300)
+    _backdate(hf.datasets_cache / "foo___bar")
+    return hf
+
+
+def test_init_recreates_removed_cache_dirs(hf):
+    shutil.rmtree(hf.hub_cache)
+    again = hcm.HFCacheManager(str(hf.hf_home))
+    assert again.hub_cache.is_dir() and again.datasets_cache.is_dir()
+
+
+def test_get_cache_stats_falls_back_on_db_error(hf, monkeypatch):
+    def boom(self, root):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(hcm._CacheIndex, "size_of", boom)
+    stats = hf.get_cache_stats()
+    assert stats["hub_size"] == 1000
+    assert stats["datasets_size"] == 300
+
+
+def test_warm_status_reuses_index_for_repo_sizes(hf, monkeypatch, capsys):
+    _make_hub_repo(hf.hub_cache, "org--b", [10] * 100)
+    hf.print_cache_status()
+
+    calls = []
+    real = hcm._statx_size
+    monkeypatch.setattr(hcm, "_statx_size", lambda p: calls.append(p) or real(p))
+    capsys.readouterr()
+    hf.print_cache_status()  # fresh _CacheIndex, as in a new process
+
+    out = capsys.readouterr().out
+    assert "Models      : 2.0 KB" in out
+    assert "org/b  (1000.0 B)" in out
+    assert "foo/bar  (300.0 B)" in out
+    # Only the (non-blobs) dataset file is re-stat'ed
+    assert len(calls) == 1
+
+
+def test_status_totals_match_listing(hf, capsys):
+    with open(hf.datasets_cache / "foo___bar" / "a.arrow", "ab") as f:
+        f.write(b"x" * 700)
+    hf.print_cache_status()
+    hf.print_cache_status()
+    out = capsys.readouterr().out.split("📊 Cache Status")[-1]
+    assert "Datasets    : 1000.0 B" in out
+    assert "foo/bar  (1000.0 B)" in out
+
+
+def test_status_finds_locks_without_walking_cache(hf, monkeypatch, capsys):
+    (hf.hub_cache / ".locks" / "models--org--a").mkdir(parents=True)
+    (hf.hub_cache / ".locks" / "models--org--a" / "sha0.lock").touch()
+    (hf.datasets_cache / "_foo_bar_builder.lock").touch()
+    (hf.hub_cache / "models--org--a" / "blobs" / "stray.lock").touch()
+
+    walked = []
+    real = hcm._collect_cleanup
+    monkeypatch.setattr(hcm, "_collect_cleanup",
+                        lambda root: walked.append(root) or real(root))
+    hf.print_cache_status()
+    assert "2 stale lock file(s) found" in capsys.readouterr().out
+    assert walked == [hf.hub_cache / ".locks"]
+
+
+def test_clean_counts_only_removed_dirs(hf, monkeypatch, capsys):
+    for name in ("datasets--org--ok", "datasets--org--stuck"):
+        (hf.hub_cache / name / "blobs").mkdir(parents=True)
+
+    real_rmtree = shutil.rmtree
+
+    def rmtree(path, ignore_errors=False):
+        if "stuck" not in str(path):  # simulate a silently failed delete
+            real_rmtree(path, ignore_errors=ignore_errors)
+
+    monkeypatch.setattr(hcm.shutil, "rmtree", rmtree)
+    assert hf.clean() == 1
+    out = capsys.readouterr().out
+    assert "Could not remove 1 dir(s)" in out
+    assert "datasets--org--stuck" in out.split("Could not remove")[1]
+    assert not (hf.hub_cache / "datasets--org--ok").exists()
+
+
+@pytest.fixture
+def batch(hf, monkeypatch):
+    """*hf* with downloads stubbed out; records what would be fetched."""
+    calls = {"models": [], "datasets": []}
+
+    def snapshot(model, token=None):
+        calls["models"].append(model)
+        return not model.startswith("bad/")
+
+    def dataset(dataset_name, name=None, split=None):
+        calls["datasets"].append((dataset_name, name, split))
+        return dataset_name != "missing"
+
+    monkeypatch.setattr(hf, "setup_environment", lambda **kw: None)
+    monkeypatch.setattr(hf, "ensure_token", lambda: "tok")
+    monkeypatch.setattr(hf, "_snapshot_model", snapshot)
+    monkeypatch.setattr(hf, "download_dataset", dataset)
+    return hf, calls
+
+
+def test_download_from_file_splits_and_counts(batch, tmp_path, capsys):
+    hf, calls = batch
+    lst = tmp_path / "list.txt"
+    lst.write_text(
+        "# models\n"
+        "org/a\n"
+        "bad/b\n"
+        "\n"
+        "dataset:hellaswag\n"
+        "dataset:cais/mmlu,all\n"
+        "dataset:missing,,train\n"
+    )
+    assert hf.download_from_file(str(lst)) == (3, 2)
+    assert sorted(calls["models"]) == ["bad/b", "org/a"]
+    assert calls["datasets"] == [
+        ("hellaswag", None, None),
+        ("cais/mmlu", "all", None),
+        ("missing", None, "train"),
+    ]
+    assert "3 succeeded, 2 failed" in capsys.readouterr().out
+
+
+def test_download_from_file_skips_malformed_lines(batch, tmp_path, capsys):
+    hf, calls = batch
+    lst = tmp_path / "list.txt"
+    lst.write_text("org/a\ndataset:foo,cfg,train,extra\n")
+    assert hf.download_from_file(str(lst)) == (1, 1)
+    assert calls["datasets"] == []
+    assert "list.txt:2" in capsys.readouterr().out
+
+
+def test_download_from_file_interrupt_cancels_queue(batch, tmp_path, monkeypatch):
+    hf, calls = batch
+    gate = threading.Event()
+    started = []
+
+    def snapshot(model, token=None):
+        if model == "org/m0":
+            raise KeyboardInterrupt
+        started.append(model)
+        gate.wait(5)
+        return True
+
+    monkeypatch.setattr(hf, "_snapshot_model", snapshot)
+    lst = tmp_path / "list.txt"
+    lst.write_text("".join(f"org/m{i}\n" for i in range(12)))
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            hf.download_from_file(str(lst))
+        assert len(started) <= 4  # at most one per worker, not the queue
+    finally:
+        gate.set()